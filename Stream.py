@@ -2,10 +2,20 @@ import streamlit as st
 import pandas as pd
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-import re
 import os # For environment variables
+import json
+import hashlib
 import sqlite3
 import time # For backoff
+import threading
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from googleapiclient.http import build_http
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # --- Configuration & API Setup ---
 st.title('📺 YouTube Data Harvesting and Warehousing')
@@ -22,6 +32,7 @@ if not API_KEY:
 api_service_name = "youtube"
 api_version = "v3"
 
+@st.cache_resource
 def Api_connector():
     try:
         return build(api_service_name, api_version, developerKey=API_KEY)
@@ -32,12 +43,10 @@ def Api_connector():
 youtube = Api_connector()
 
 # --- SQLite Database Setup (Initial run or on app start) ---
-# Ensure this runs only once or when you need to create/recreate tables
-conn = sqlite3.connect("db1.db")
-cursor = conn.cursor()
+ETAG_CACHE_MAX_AGE = 30 * 24 * 3600 # seconds
 
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS videos (
+VIDEOS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
         Video_Id TEXT PRIMARY KEY,
         Video_title TEXT,
         Video_Description TEXT,
@@ -50,67 +59,416 @@ cursor.execute('''
         Video_commentcount INTEGER,
         Video_duration INTEGER,
         Video_thumbnails TEXT,
-        Video_caption TEXT
+        Video_caption INTEGER
     )
-''')
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS channels (
-        channel_name TEXT,
-        channel_id TEXT PRIMARY KEY,
-        channel_des TEXT,
-        channel_playid TEXT,
-        channel_viewcount INTEGER,
-        channel_subcount INTEGER
-    )
-''')
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS comments (
-        comment_id TEXT PRIMARY KEY,
-        Comment_Text TEXT,
-        Comment_Authorname TEXT,
-        published_date TEXT,
-        video_id TEXT,
-        channel_id TEXT
-    )
-''')
-conn.commit()
-conn.close()
+'''
+
+def init_schema(conn):
+    # Runs once per process from connection_pool(), so the insert helpers don't repeat the DDL
+    conn.execute(VIDEOS_TABLE_SQL.format(table="videos"))
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS channels (
+            channel_name TEXT,
+            channel_id TEXT PRIMARY KEY,
+            channel_des TEXT,
+            channel_playid TEXT,
+            channel_viewcount INTEGER,
+            channel_subcount INTEGER
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS comments (
+            comment_id TEXT PRIMARY KEY,
+            Comment_Text TEXT,
+            Comment_Authorname TEXT,
+            published_date TEXT,
+            video_id TEXT,
+            channel_id TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS etag_cache (
+            resource_id TEXT PRIMARY KEY,
+            etag TEXT,
+            payload BLOB,
+            fetched_at REAL
+        )
+    ''')
+    # Drop entries that haven't been requested or revalidated recently
+    conn.execute("DELETE FROM etag_cache WHERE fetched_at < ?",
+                 (time.time() - ETAG_CACHE_MAX_AGE,))
+    # Per-channel aggregates kept up to date by insert_videos_into_sqlite
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS channel_stats (
+            channel_id TEXT PRIMARY KEY,
+            video_count INTEGER,
+            total_views INTEGER,
+            total_likes INTEGER,
+            avg_duration REAL
+        )
+    ''')
+    # One-shot migration: older databases stored Video_caption as 'true'/'false' text
+    # and had no primary key on Video_Id
+    video_info = {row[1]: row for row in conn.execute("PRAGMA table_info(videos)")}
+    if video_info["Video_caption"][2].upper() != "INTEGER" or not video_info["Video_Id"][5]:
+        # Rebuild the table rather than DROP COLUMN, which needs SQLite 3.35+;
+        # duplicate Video_Ids collapse to the first row copied
+        copied = ", ".join(c for c in VIDEO_COLUMNS if c != "Video_caption")
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DROP TABLE IF EXISTS videos_new")
+            conn.execute(VIDEOS_TABLE_SQL.format(table="videos_new"))
+            conn.execute(f"INSERT OR IGNORE INTO videos_new({copied}, Video_caption) "
+                         f"SELECT {copied}, (Video_caption IN ('true', 1)) FROM videos")
+            conn.execute("DROP TABLE videos")
+            conn.execute("ALTER TABLE videos_new RENAME TO videos")
+    # Indexes for the joins and ORDER BY columns used by execute_query
+    conn.executescript('''
+        CREATE INDEX IF NOT EXISTS idx_videos_channel ON videos(channel_id);
+        CREATE INDEX IF NOT EXISTS idx_videos_views ON videos(Video_viewcount DESC);
+        CREATE INDEX IF NOT EXISTS idx_videos_likes ON videos(Video_likecount DESC);
+        CREATE INDEX IF NOT EXISTS idx_videos_comments_cnt ON videos(Video_commentcount DESC);
+        CREATE INDEX IF NOT EXISTS idx_videos_pubdate ON videos(Video_pubdate);
+        CREATE INDEX IF NOT EXISTS idx_comments_videoid ON comments(video_id);
+    ''')
+    # Rebuild the summaries in case videos were written before channel_stats existed
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        refresh_channel_stats(conn)
+
+def refresh_channel_stats(conn, channel_ids=None):
+    # Recompute channel_stats rows from videos; call inside the insert transaction
+    where, params = "WHERE true", () # An upsert on INSERT ... SELECT needs a WHERE clause
+    if channel_ids is not None:
+        where, params = f"WHERE channel_id IN ({', '.join('?' * len(channel_ids))})", tuple(channel_ids)
+    conn.execute(f'''
+        INSERT INTO channel_stats(channel_id, video_count, total_views, total_likes, avg_duration)
+        SELECT channel_id, COUNT(Video_Id), SUM(Video_viewcount), SUM(Video_likecount), AVG(Video_duration)
+        FROM videos
+        {where}
+        GROUP BY channel_id
+        ON CONFLICT(channel_id) DO UPDATE SET
+            video_count = excluded.video_count,
+            total_views = excluded.total_views,
+            total_likes = excluded.total_likes,
+            avg_duration = excluded.avg_duration
+    ''', params)
+
+DB_POOL_SIZE = 10 # Idle connections kept open: one per pool worker plus script threads
+
+def open_connection():
+    # isolation_level=None means transactions are explicit.
+    # WAL + synchronous=NORMAL avoids an fsync per committed insert.
+    # check_same_thread=False lets pooled connections move between threads;
+    # get_conn() still hands each one to a single thread at a time
+    conn = sqlite3.connect("db1.db", isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536") # 64 MiB page cache
+    return conn
+
+@st.cache_resource
+def connection_pool():
+    # Cached per process, so connections and their PRAGMAs survive reruns;
+    # schema setup runs once, on the first connection
+    conn = open_connection()
+    try:
+        init_schema(conn)
+    except Exception:
+        conn.close()
+        raise
+    pool = queue.Queue(maxsize=DB_POOL_SIZE)
+    pool.put(conn)
+    return pool
+
+@contextmanager
+def get_conn():
+    # Check a connection out for one query or transaction. Sessions and pool workers
+    # never hold the same connection at once, so their transactions can't interleave
+    pool = connection_pool()
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = open_connection()
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+def dataframe_rows(df, columns=None):
+    # Convert numpy scalars/NaN into plain Python values sqlite3 can bind
+    if columns is not None:
+        df = df[columns]
+    df = df.astype(object)
+    return df.where(df.notna(), None).itertuples(index=False, name=None)
+
+def insert_sql(table, columns):
+    # INSERT OR IGNORE keeps the skip-duplicate-primary-key behaviour without raising
+    return (f"INSERT OR IGNORE INTO {table}({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})")
+
+VIDEO_COLUMNS = ["Video_Id", "Video_title", "Video_Description", "channel_id", "video_tags",
+                 "Video_pubdate", "Video_viewcount", "Video_likecount", "Video_favoritecount",
+                 "Video_commentcount", "Video_duration", "Video_thumbnails", "Video_caption"]
+# Flattened videos().list fields -> videos table columns
+VIDEO_FIELDS = {
+    "id": "Video_Id",
+    "snippet.title": "Video_title",
+    "snippet.description": "Video_Description",
+    "snippet.channelId": "channel_id",
+    "snippet.tags": "video_tags",
+    "snippet.publishedAt": "Video_pubdate",
+    "statistics.viewCount": "Video_viewcount",
+    "statistics.likeCount": "Video_likecount",
+    "statistics.favoriteCount": "Video_favoritecount",
+    "statistics.commentCount": "Video_commentcount", # Corrected key
+    "contentDetails.duration": "Video_duration",
+    "snippet.thumbnails.default.url": "Video_thumbnails",
+    "contentDetails.caption": "Video_caption",
+}
+COMMENT_COLUMNS = ["comment_id", "Comment_Text", "Comment_Authorname", "published_date",
+                   "video_id", "channel_id"]
+CHANNEL_COLUMNS = ["channel_name", "channel_id", "channel_des", "channel_playid",
+                   "channel_viewcount", "channel_subcount"]
+
+# Fixed statements, so sqlite3's statement cache compiles each one only once
+VIDEO_INSERT_SQL = insert_sql("videos", VIDEO_COLUMNS)
+COMMENT_INSERT_SQL = insert_sql("comments", COMMENT_COLUMNS)
+CHANNEL_INSERT_SQL = insert_sql("channels", CHANNEL_COLUMNS)
+
+def insert_channel(channel_df):
+    # channel_info and fetch_channel_data name columns differently but share the table's order.
+    # Returns False when the channel already exists
+    with get_conn() as conn, conn:
+        conn.execute("BEGIN IMMEDIATE")
+        inserted = conn.executemany(CHANNEL_INSERT_SQL, dataframe_rows(channel_df)).rowcount
+    execute_query.clear()
+    return inserted > 0
+
+# --- Helpers for concurrent API fetches ---
+MAX_WORKERS = 8
+PROGRESS_EVERY = 50 # Items between progress bar updates
+_thread_local = threading.local()
+
+def thread_http():
+    # httplib2.Http is not thread-safe, so every thread (session script threads and pool workers) gets its own transport
+    if not hasattr(_thread_local, "http"):
+        _thread_local.http = build_http()
+    return _thread_local.http
+
+def ui_message(level, text):
+    # st.warning/st.error etc.; collected instead while a message list is active on this thread
+    messages = getattr(_thread_local, "ui_messages", None)
+    if messages is not None:
+        messages.append((level, text))
+    else:
+        getattr(st, level)(text)
+
+def show_ui_messages(messages):
+    for level, text in messages:
+        ui_message(level, text)
+
+@contextmanager
+def capture_ui_messages(messages):
+    # st.cache_data replays st.* calls on every cache hit, so cached fetchers collect
+    # their messages here and the uncached wrapper renders them once
+    previous = getattr(_thread_local, "ui_messages", None)
+    _thread_local.ui_messages = messages
+    try:
+        yield messages
+    finally:
+        _thread_local.ui_messages = previous
+
+def init_worker(ctx, messages):
+    # The script run context keeps st.cache_* usable in workers; UI output goes through messages
+    add_script_run_ctx(None, ctx)
+    _thread_local.ui_messages = messages
+
+@contextmanager
+def api_executor():
+    messages = []
+    executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, initializer=init_worker,
+                                  initargs=(get_script_run_ctx(), messages))
+    try:
+        with executor:
+            yield executor
+    finally:
+        # Workers have finished here, so pass their messages on from the calling thread
+        show_ui_messages(messages)
+
+# --- Client-side rate limiting ---
+class RateLimiter:
+    # Sliding-window requests-per-minute cap plus AIMD control of in-flight requests
+    def __init__(self, rpm, window=60, max_concurrency=MAX_WORKERS, alpha=0.5, beta=0.5):
+        self.rpm = rpm
+        self.window = window
+        self.max_concurrency = max_concurrency
+        self.alpha = alpha # Additive increase on success
+        self.beta = beta # Multiplicative decrease on throttling
+        self.concurrency = float(max_concurrency)
+        self.in_flight = 0
+        self.timestamps = deque()
+        self.resume_at = 0.0 # Shared backoff deadline set after throttling
+        self._cond = threading.Condition()
+
+    def wait_if_throttled(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if now < self.resume_at:
+                    self._cond.wait(self.resume_at - now)
+                    continue
+                while self.timestamps and now - self.timestamps[0] >= self.window:
+                    self.timestamps.popleft()
+                window_full = len(self.timestamps) >= self.rpm
+                if not window_full and self.in_flight < int(self.concurrency):
+                    self.timestamps.append(now)
+                    self.in_flight += 1
+                    return
+                # Sleep until the oldest request leaves the window, or until a slot is released
+                self._cond.wait(self.window - (now - self.timestamps[0]) if window_full else None)
+
+    def backoff(self, delay):
+        # Hold back new requests for delay seconds; requests already in flight carry on
+        with self._cond:
+            self.resume_at = max(self.resume_at, time.monotonic() + delay)
+            self._cond.notify_all()
+
+    def release(self, throttled=False):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.concurrency = max(1.0, self.concurrency * self.beta)
+            else:
+                self.concurrency = min(float(self.max_concurrency), self.concurrency + self.alpha)
+            self._cond.notify_all()
+
+@st.cache_resource
+def get_rate_limiter():
+    # Shared across reruns so the request window survives button clicks
+    return RateLimiter(rpm=int(os.getenv("YOUTUBE_API_RPM", "600")))
+
+rate_limiter = get_rate_limiter()
+
+def retry_after_seconds(e):
+    # Retry-After may be delta-seconds or an HTTP date
+    value = e.resp.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
 
 # --- Helper for API Calls with Backoff ---
-def safe_api_call(request_callable, *args, **kwargs):
+NOT_MODIFIED = object() # Returned by safe_api_call when a conditional request gets a 304
+COMMENTS_DISABLED = object() # Returned when the caller opted in via permanent_reasons
+COMMENT_PERMANENT_REASONS = {"commentsDisabled", "videoNotFound", "private"}
+
+def error_reason(e):
+    # First "reason" from the API's JSON error body, e.g. "commentsDisabled"
+    try:
+        return json.loads(e.content)["error"]["errors"][0]["reason"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+def safe_api_call(request_callable, *args, permanent_reasons=(), **kwargs):
+    # permanent_reasons: error reasons the caller handles itself via the COMMENTS_DISABLED sentinel
     retries = 0
     max_retries = 5
     initial_delay = 1 # seconds
 
     while retries < max_retries:
+        rate_limiter.wait_if_throttled()
         try:
-            return request_callable(*args, **kwargs).execute()
+            response = request_callable(*args, **kwargs)
+            rate_limiter.release()
+            return response
         except HttpError as e:
-            if e.resp.status == 403 and "quotaExceeded" in str(e):
-                delay = initial_delay * (2 ** retries)
-                st.warning(f"Quota exceeded. Retrying in {delay:.1f} seconds (Attempt {retries + 1}/{max_retries})...")
-                time.sleep(delay)
+            status = e.resp.status
+            reason = error_reason(e)
+            throttled = (status == 429 or status >= 500 or
+                         (status == 403 and ("quotaExceeded" in str(e) or "rateLimitExceeded" in str(e))))
+            rate_limiter.release(throttled=throttled)
+            if reason in permanent_reasons:
+                return COMMENTS_DISABLED
+            elif throttled:
+                delay = retry_after_seconds(e)
+                if delay is None:
+                    delay = initial_delay * (2 ** retries)
+                ui_message("warning", f"Rate limited ({status}). Retrying in {delay:.1f} seconds (Attempt {retries + 1}/{max_retries})...")
+                # The wait happens in wait_if_throttled on a Condition, not in a blocking sleep here
+                rate_limiter.backoff(delay)
                 retries += 1
-            elif e.resp.status == 404:
-                st.warning(f"Resource not found (404) for request. Skipping. Error: {e}")
+            elif status == 304:
+                return NOT_MODIFIED
+            elif status == 404:
+                ui_message("warning", f"Resource not found (404) for request. Skipping. Error: {e}")
                 return None
             else:
-                st.error(f"An unexpected API error occurred: {e}")
+                ui_message("error", f"An unexpected API error occurred: {e}")
                 raise
         except Exception as e:
-            st.error(f"An unexpected error occurred during API call: {e}")
+            rate_limiter.release()
+            ui_message("error", f"An unexpected error occurred during API call: {e}")
             raise
-    st.error(f"Failed after {max_retries} retries due to quota issues. Please check your Google Cloud Console for quota status.")
+    ui_message("error", f"Failed after {max_retries} retries due to quota issues. Please check your Google Cloud Console for quota status.")
     return None
 
+# --- Response field masks: request only what gets written to SQLite ---
+# etag is kept so conditional_api_call can still send If-None-Match
+CHANNEL_FIELDS_MASK = "etag,items(id,snippet(title,description),contentDetails/relatedPlaylists/uploads,statistics(viewCount,subscriberCount))"
+VIDEO_FIELDS_MASK = ("etag,items(id,snippet(title,description,channelId,tags,publishedAt,thumbnails/default/url),"
+                     "statistics(viewCount,likeCount,favoriteCount,commentCount),contentDetails(duration,caption))")
+COMMENT_FIELDS_MASK = "nextPageToken,items(id,snippet/topLevelComment/snippet(textDisplay,authorDisplayName,publishedAt,videoId))"
+
 # --- Existing Functions (modified to use safe_api_call and error handling) ---
 
-def channel_info(channel_id):
+def conditional_api_call(request, resource_id, **kwargs):
+    # Send the stored ETag as If-None-Match and reuse the stored payload on 304 Not Modified
+    with get_conn() as conn:
+        cached = conn.execute("SELECT etag, payload FROM etag_cache WHERE resource_id = ?", (resource_id,)).fetchone()
+    if cached:
+        request.headers["If-None-Match"] = cached[0]
+
+    response = safe_api_call(request.execute, **kwargs)
+    if response is NOT_MODIFIED:
+        with get_conn() as conn:
+            conn.execute("UPDATE etag_cache SET fetched_at = ? WHERE resource_id = ?", (time.time(), resource_id))
+        return json.loads(cached[1])
+    if response and response.get("etag"):
+        with get_conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO etag_cache(resource_id, etag, payload, fetched_at) VALUES (?, ?, ?, ?)",
+                         (resource_id, response["etag"], json.dumps(response).encode(), time.time()))
+    return response
+
+class IncompleteFetchError(Exception):
+    # Raised inside cached fetchers so st.cache_data never stores a failed or partial result
+    def __init__(self, message, partial):
+        super().__init__(message)
+        self.partial = partial
+
+@st.cache_data(ttl=300, show_spinner=False)
+def cached_channel_info(channel_id, _messages):
+    with capture_ui_messages(_messages):
+        return fetch_channel_info(channel_id)
+
+def fetch_channel_info(channel_id):
     request = youtube.channels().list(
                     part="snippet,contentDetails,statistics",
-                    id=channel_id
+                    id=channel_id,
+                    fields=CHANNEL_FIELDS_MASK
     )
-    response = safe_api_call(request.execute)
+    response = conditional_api_call(request, f"channels:{channel_id}", http=thread_http())
     if response and response.get("items"):
         data = {
                             "Channel_Name": response["items"][0]["snippet"]["title"],
@@ -121,166 +479,220 @@ def channel_info(channel_id):
                             "channel_subcount": response["items"][0]["statistics"]["subscriberCount"]
                              }
         return pd.DataFrame(data,index=[0])
-    st.warning(f"No channel data found for ID: {channel_id}")
-    return pd.DataFrame()
+    raise IncompleteFetchError(f"No channel data found for ID: {channel_id}", pd.DataFrame())
 
-def eachchanneldetails(channel_ids):
-    conn = sqlite3.connect('db1.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS channels (
-            channel_name TEXT,
-            channel_id TEXT PRIMARY KEY,
-            channel_des TEXT,
-            channel_playid TEXT,
-            channel_viewcount INTEGER,
-            channel_subcount INTEGER
-        )
-    ''')
-    conn.commit()
+def channel_info(channel_id):
+    messages = []
+    try:
+        return cached_channel_info(channel_id, messages)
+    except IncompleteFetchError as e:
+        messages.append(("warning", str(e)))
+        return e.partial
+    finally:
+        show_ui_messages(messages)
 
+def eachchanneldetails(channel_ids):
     for channel_id in channel_ids:
         df = channel_info(channel_id)
         if not df.empty:
             try:
-                df.to_sql('channels', conn, if_exists='append', index=False)
-                st.success(f"✅ Channel '{df['Channel_Name'].iloc[0]}' data inserted.")
-            except sqlite3.IntegrityError:
-                st.info(f"Channel '{df['Channel_Name'].iloc[0]}' (ID: {channel_id}) already exists. Skipping insertion.")
+                if insert_channel(df):
+                    st.success(f"✅ Channel '{df['Channel_Name'].iloc[0]}' data inserted.")
+                else:
+                    st.info(f"Channel '{df['Channel_Name'].iloc[0]}' (ID: {channel_id}) already exists. Skipping insertion.")
             except Exception as e:
                 st.error(f"Error inserting channel {channel_id} data: {e}")
         else:
             st.warning(f"Could not fetch data for channel ID: {channel_id}")
-    conn.close()
 
 
-def playlist_videos_id(channel_ids):
-    all_video_ids = []
-    for current_channel_id in channel_ids: # Renamed from channels_id to avoid conflict
-        videos_ids = []
-        st.info(f"Fetching playlist for channel: {current_channel_id}")
-        response = safe_api_call(youtube.channels().list(part="contentDetails",id=current_channel_id).execute)
-        
-        if response and 'items' in response and len(response["items"]) > 0:
-            playlist_Id = response["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
-            nextPageToken = None
+def uploads_video_ids(current_channel_id):
+    # Returns (video_ids, complete); complete is False if any page could not be fetched
+    videos_ids = []
+    response = safe_api_call(youtube.channels().list(part="contentDetails",id=current_channel_id,
+                             fields="items/contentDetails/relatedPlaylists/uploads").execute, http=thread_http())
 
-            while True:
-                response2 = safe_api_call(youtube.playlistItems().list(
-                   part="snippet",
-                   playlistId=playlist_Id, maxResults=50,
-                   pageToken=nextPageToken).execute)
-                
-                if response2 is None: # safe_api_call returned None
-                    break
+    if response and 'items' in response and len(response["items"]) > 0:
+        playlist_Id = response["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
+        nextPageToken = None
 
-                for i in range(len(response2.get("items", []))):
-                    videos_ids.append(response2["items"][i]["snippet"]["resourceId"]["videoId"])
-                
-                nextPageToken = response2.get("nextPageToken")
-                if nextPageToken is None:
-                    break
-        else:
-            st.error(f"No content details found for channel ID: {current_channel_id}. It might be invalid or restricted.")
-        all_video_ids.extend(videos_ids)
-    return all_video_ids
+        while True:
+            response2 = safe_api_call(youtube.playlistItems().list(
+               part="snippet",
+               playlistId=playlist_Id, maxResults=50,
+               fields="nextPageToken,items/snippet/resourceId/videoId",
+               pageToken=nextPageToken).execute, http=thread_http())
 
-def iso8601_duration_to_seconds(duration):
-    match = re.match(r'^PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?$', duration)
-    if not match:
-        return 0 # Default to 0 seconds if format is unexpected
+            if response2 is None: # safe_api_call returned None
+                return videos_ids, False
 
-    hours = int(match.group(1)) if match.group(1) else 0
-    minutes = int(match.group(2)) if match.group(2) else 0
-    seconds = int(match.group(3)) if match.group(3) else 0
+            for i in range(len(response2.get("items", []))):
+                videos_ids.append(response2["items"][i]["snippet"]["resourceId"]["videoId"])
 
-    total_seconds = (hours * 3600) + (minutes * 60) + seconds
-    return total_seconds
+            nextPageToken = response2.get("nextPageToken")
+            if nextPageToken is None:
+                break
+    else:
+        ui_message("error", f"No content details found for channel ID: {current_channel_id}. It might be invalid or restricted.")
+        return videos_ids, False
+    return videos_ids, True
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_playlist_videos_id(channel_ids, _messages):
+    # channel_ids must be a tuple so the cache can hash it
+    with capture_ui_messages(_messages):
+        return fetch_playlist_videos_id(channel_ids)
+
+def fetch_playlist_videos_id(channel_ids):
+    all_video_ids = []
+    incomplete = []
+    ui_message("info", f"Fetching playlists for channels: {', '.join(channel_ids)}")
+    # Each playlist must be paginated in order, so parallelism is across channels
+    with api_executor() as executor:
+        for channel_id, (videos_ids, complete) in zip(channel_ids, executor.map(uploads_video_ids, channel_ids)):
+            all_video_ids.extend(videos_ids)
+            if not complete:
+                incomplete.append(channel_id)
+    if incomplete:
+        raise IncompleteFetchError(f"Video list is incomplete for channel(s) {', '.join(incomplete)}; "
+                                   f"only {len(all_video_ids)} video IDs were fetched. Try again later.", all_video_ids)
+    return all_video_ids
+
+def playlist_videos_id(channel_ids):
+    messages = []
+    try:
+        return cached_playlist_videos_id(channel_ids, messages)
+    except IncompleteFetchError as e:
+        messages.append(("warning", str(e)))
+        return e.partial
+    finally:
+        show_ui_messages(messages)
 
 def videos_data(video_ids):
     st.subheader("Fetching Video Details")
-    all_video_stats = []
 
     if not video_ids:
         st.warning("No video IDs provided to fetch data.")
         return pd.DataFrame()
 
     # Process video IDs in batches of 50 to optimize quota (1 unit per 50 videos)
-    for i in range(0, len(video_ids), 50):
-        batch_ids = video_ids[i:i+50]
-        st.write(f"▶️ Fetching batch of video IDs: `{', '.join(batch_ids)}`")
-        
+    # The uploads list is newest-first, so anchor the batches at the oldest end: a new upload then
+    # only changes the first batch and the rest keep their etag_cache keys
+    first = len(video_ids) % 50
+    batches = ([video_ids[:first]] if first else []) + [video_ids[i:i+50] for i in range(first, len(video_ids), 50)]
+
+    def fetch_video_batch(batch_ids):
         request = youtube.videos().list(
             part="snippet,contentDetails,statistics",
-            id=','.join(batch_ids)
+            id=','.join(batch_ids),
+            fields=VIDEO_FIELDS_MASK
         )
-        
-        response = safe_api_call(request.execute)
+        batch_key = hashlib.sha1(','.join(sorted(batch_ids)).encode()).hexdigest()
+        return conditional_api_call(request, f"videos:{batch_key}", http=thread_http())
+
+    all_items = []
+    failed_batches = 0
+    pbar = st.progress(0.0)
+    log = []
+    with api_executor() as executor:
+        # A batch already holds 50 videos, so the bar moves once per batch
+        for i, (batch_ids, response) in enumerate(zip(batches, executor.map(fetch_video_batch, batches)), start=1):
+            if response and response.get("items"):
+                all_items.extend(response["items"])
+                log.append(f"▶️ Fetched batch of video IDs: {', '.join(batch_ids)}")
+            else:
+                failed_batches += 1
+                log.append(f"⚠️ No data returned for video batch: {', '.join(batch_ids)}")
+            pbar.progress(i / len(batches))
 
-        if response and response.get("items"):
-            for item in response["items"]:
-                snippet = item.get("snippet", {})
-                statistics = item.get("statistics", {})
-                contentDetails = item.get("contentDetails", {})
-
-                video_info = {
-                    "Video_Id": item.get("id"),
-                    "Video_title": snippet.get("title"),
-                    "Video_Description": snippet.get("description"),
-                    "channel_id": snippet.get("channelId"),
-                    "video_tags": ', '.join(snippet.get("tags", [])), # Store as comma-separated string
-                    "Video_pubdate": snippet.get("publishedAt"),
-                    "Video_viewcount": int(statistics.get("viewCount", 0)),
-                    "Video_likecount": int(statistics.get("likeCount", 0)),
-                    "Video_favoritecount": int(statistics.get("favoriteCount", 0)),
-                    "Video_commentcount": int(statistics.get("commentCount", 0)), # Corrected key
-                    "Video_duration": iso8601_duration_to_seconds(contentDetails.get("duration", "PT0S")),
-                    "Video_thumbnails": snippet.get("thumbnails", {}).get("default", {}).get("url"),
-                    "Video_caption": contentDetails.get("caption", "false") # 'false' if no caption
-                }
-                all_video_stats.append(video_info)
-        else:
-            st.warning(f"No data returned for video batch: {batch_ids}. Could be invalid IDs or quota issues.")
+    if failed_batches:
+        st.warning(f"No data returned for {failed_batches} video batch(es). Could be invalid IDs or quota issues.")
+    with st.expander("Log"):
+        st.code("\n".join(log))
 
-    return pd.DataFrame(all_video_stats)
+    if not all_items:
+        return pd.DataFrame()
 
+    # Flatten every item in one pass, then coerce whole columns instead of per-item dict lookups
+    df = pd.json_normalize(all_items, sep='.').reindex(columns=list(VIDEO_FIELDS)).rename(columns=VIDEO_FIELDS)
+    df["video_tags"] = df["video_tags"].map(lambda tags: ', '.join(tags) if isinstance(tags, list) else '') # Store as comma-separated string
+    for column in ["Video_viewcount", "Video_likecount", "Video_favoritecount", "Video_commentcount"]:
+        df[column] = pd.to_numeric(df[column], errors='coerce').fillna(0).astype('int64')
+    # One C-level regex scan over the whole column; unmatched durations become 0 seconds
+    parts = (df["Video_duration"].fillna("PT0S").astype(str)
+             .str.extract(r'^PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?$')
+             .apply(pd.to_numeric).fillna(0).astype('int64'))
+    df["Video_duration"] = 3600 * parts[0] + 60 * parts[1] + parts[2]
+    df["Video_caption"] = (df["Video_caption"] == "true").astype('int64') # 0 if no caption
+    return df[VIDEO_COLUMNS]
 
-def insert_videos_into_sqlite(df1):
-    conn = sqlite3.connect('db1.db')
-    cursor = conn.cursor()
-    # Ensure table creation matches schema and primary key
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS videos (
-            Video_Id TEXT PRIMARY KEY,
-            Video_title TEXT,
-            Video_Description TEXT,
-            channel_id TEXT,
-            video_tags TEXT,
-            Video_pubdate TEXT,
-            Video_viewcount INTEGER,
-            Video_likecount INTEGER,
-            Video_favoritecount INTEGER,
-            Video_commentcount INTEGER,
-            Video_duration INTEGER,
-            Video_thumbnails TEXT,
-            Video_caption TEXT
-        )
-    ''')
-    conn.commit()
 
+def insert_videos_into_sqlite(df1):
     if not df1.empty:
         try:
-            # Use to_sql with if_exists='append' and handle duplicates via primary key
-            df1.to_sql('videos', conn, if_exists='append', index=False)
-            st.success(f"✅ Successfully inserted {len(df1)} video records into 'videos' table!")
+            # One explicit transaction for the whole batch instead of a commit per row
+            with get_conn() as conn, conn:
+                conn.execute("BEGIN IMMEDIATE")
+                inserted = conn.executemany(VIDEO_INSERT_SQL, dataframe_rows(df1, VIDEO_COLUMNS)).rowcount
+                refresh_channel_stats(conn, df1["channel_id"].dropna().unique().tolist())
+            execute_query.clear() # Drop cached query results that are now stale
+            st.success(f"✅ Successfully inserted {inserted} video records into 'videos' table! "
+                       f"({len(df1) - inserted} already existed)")
         except Exception as e:
             st.error(f"Error inserting video data: {e}")
             # You might want more granular error handling here for specific SQLite errors
     else:
         st.warning("No video data to insert.")
-    conn.close()
 
-def comments_inf(video_ids, current_channel_id_for_comments): # Pass channel_id here
+def fetch_comments_for_video(video_id, current_channel_id_for_comments, max_pages_per_video=5):
+    commentdata = []
+    nextpagetoken = None
+
+    # Newest comments first, stopping after max_pages_per_video pages of 100
+    for _ in range(max_pages_per_video):
+        request = youtube.commentThreads().list(
+            part="snippet",
+            videoId=video_id,
+            maxResults=100,
+            order="time",
+            fields=COMMENT_FIELDS_MASK,
+            pageToken=nextpagetoken
+        )
+
+        response = safe_api_call(request.execute, http=thread_http(),
+                                 permanent_reasons=COMMENT_PERMANENT_REASONS)
+
+        if response is None:
+            break
+
+        if response is COMMENTS_DISABLED:
+            return COMMENTS_DISABLED
+
+        if response.get("items"):
+            for item in response["items"]:
+                top_level_comment_snippet = item.get("snippet", {}).get("topLevelComment", {}).get("snippet", {})
+                # The channelId in commentThreads().list response snippet refers to the video's channel
+                # So it's fine to pass current_channel_id_for_comments which should be the video's channel
+
+                comment = {
+                    "comment_id": item.get("id"),
+                    "Comment_Text": top_level_comment_snippet.get("textDisplay"),
+                    "Comment_Authorname": top_level_comment_snippet.get("authorDisplayName"),
+                    "published_date": top_level_comment_snippet.get("publishedAt"),
+                    "video_id": top_level_comment_snippet.get("videoId"),
+                    "channel_id": current_channel_id_for_comments
+                }
+                commentdata.append(comment)
+
+            nextpagetoken = response.get('nextPageToken')
+            if not nextpagetoken:
+                break
+        else:
+            break
+
+    return commentdata
+
+def comments_inf(video_ids, current_channel_id_for_comments, max_pages_per_video=5): # Pass channel_id here
     commentdata = []
     
     if not video_ids:
@@ -289,84 +701,44 @@ def comments_inf(video_ids, current_channel_id_for_comments): # Pass channel_id
 
     st.subheader(f"Fetching comments for {len(video_ids)} videos...")
 
-    for video_id in video_ids:
-        st.write(f"💬 Fetching comments for video ID: `{video_id}`")
-        nextpagetoken = None
-        
-        while True:
-            request = youtube.commentThreads().list(
-                part="snippet",
-                videoId=video_id,
-                maxResults=50,
-                pageToken=nextpagetoken
-            )
-            
-            response = safe_api_call(request.execute)
-
-            if response is None:
-                break 
-
-            # Check for comments disabled error (specific 403 reason)
-            if "error" in response and response["error"]["code"] == 403:
-                # Specific check for comments disabled error
-                if any("commentsDisabled" in detail.get("reason", "") for detail in response["error"].get("errors", [])):
-                    st.warning(f"⚠️ Comments are disabled for video ID: {video_id}. Skipping.")
-                    break
-                else:
-                    st.error(f"Unhandled 403 API error for video {video_id}: {response['error']}")
-                    break # Break for other 403 errors too
-
-            if response.get("items"):
-                for item in response["items"]:
-                    top_level_comment_snippet = item.get("snippet", {}).get("topLevelComment", {}).get("snippet", {})
-                    # The channelId in commentThreads().list response snippet refers to the video's channel
-                    # So it's fine to pass current_channel_id_for_comments which should be the video's channel
-                    
-                    comment = {
-                        "comment_id": item.get("id"),
-                        "Comment_Text": top_level_comment_snippet.get("textDisplay"),
-                        "Comment_Authorname": top_level_comment_snippet.get("authorDisplayName"),
-                        "published_date": top_level_comment_snippet.get("publishedAt"),
-                        "video_id": top_level_comment_snippet.get("videoId"),
-                        "channel_id": current_channel_id_for_comments
-                    }
-                    commentdata.append(comment)
-                
-                nextpagetoken = response.get('nextPageToken')
-                if not nextpagetoken:
-                    break
+    # Each worker owns the pagination loop for one video; results are concatenated here
+    with api_executor() as executor:
+        results = executor.map(fetch_comments_for_video, video_ids,
+                               [current_channel_id_for_comments] * len(video_ids),
+                               [max_pages_per_video] * len(video_ids))
+        pbar = st.progress(0.0)
+        log = []
+        for i, (video_id, comments) in enumerate(zip(video_ids, results), start=1):
+            if comments is COMMENTS_DISABLED:
+                log.append(f"⚠️ Comments are disabled or unavailable for video ID: {video_id}. Skipped.")
             else:
-                st.info(f"No more comments found for video ID: {video_id} or end of pages.")
-                break
-                
+                log.append(f"💬 Fetched {len(comments)} comments for video ID: {video_id}")
+                commentdata.extend(comments)
+            # Updating the bar per video would cost one websocket message each
+            if i % PROGRESS_EVERY == 0 or i == len(video_ids):
+                pbar.progress(i / len(video_ids))
+
+    with st.expander("Log"):
+        st.code("\n".join(log))
     return pd.DataFrame(commentdata)
 
 def insert_comments_into_sqlite(df2):
-    conn = sqlite3.connect('db1.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS comments (
-            comment_id TEXT PRIMARY KEY,
-            Comment_Text TEXT,
-            Comment_Authorname TEXT,
-            published_date TEXT,
-            video_id TEXT,
-            channel_id TEXT
-        )
-    ''')
-    conn.commit()
-
     if not df2.empty:
         try:
-            df2.to_sql('comments', conn, if_exists='append', index=False)
-            st.success(f"✅ Successfully inserted {len(df2)} comment records into 'comments' table!")
+            with get_conn() as conn, conn:
+                conn.execute("BEGIN IMMEDIATE")
+                inserted = conn.executemany(COMMENT_INSERT_SQL, dataframe_rows(df2, COMMENT_COLUMNS)).rowcount
+            execute_query.clear()
+            st.success(f"✅ Successfully inserted {inserted} comment records into 'comments' table! "
+                       f"({len(df2) - inserted} already existed)")
         except Exception as e:
             st.error(f"Error inserting comment data: {e}")
     else:
         st.warning("No comment data to insert.")
-    conn.close()
 
 # --- Streamlit Main App Logic ---
+VIEWABLE_TABLES = ["channels", "videos", "comments"]
+
 def main():
     st.sidebar.header("Data Operations")
 
@@ -374,19 +746,28 @@ def main():
 
     if Options == "View Tables":
         st.header("View Existing Tables")
-        table_choice = st.selectbox("Select Table to View", ["channels", "videos", "comments"])
-        conn = sqlite3.connect("db1.db")
+        table_choice = st.selectbox("Select Table to View", VIEWABLE_TABLES)
+        page_size = st.number_input("Page size", min_value=1, max_value=10_000, value=500, step=100)
+        page = st.number_input("Page", min_value=1, value=1, step=1)
+        if table_choice not in VIEWABLE_TABLES: # Table names can't be bound as parameters
+            st.error("Invalid table selected.")
+            return
         try:
-            df = pd.read_sql(f"SELECT * FROM {table_choice}", conn)
-            if df.empty:
+            # Only one page is read into memory, however large the table is
+            offset = (page - 1) * page_size
+            with get_conn() as conn:
+                total_rows = conn.execute(f"SELECT COUNT(*) FROM {table_choice}").fetchone()[0]
+                df = pd.read_sql(f"SELECT * FROM {table_choice} LIMIT ? OFFSET ?", conn, params=(page_size, offset))
+            if total_rows == 0:
                 st.warning(f"⚠️ {table_choice.capitalize()} table exists, but it's empty.")
+            elif df.empty:
+                st.warning(f"⚠️ Page {page} is past the end of the {table_choice} table ({total_rows} rows).")
             else:
-                df.index += 1
+                df.index += offset + 1
+                st.caption(f"Showing rows {offset + 1}-{offset + len(df)} of {total_rows}")
                 st.dataframe(df)
-        except pd.io.sql.DatabaseError as e:
+        except (pd.io.sql.DatabaseError, sqlite3.Error) as e:
             st.error(f"❌ Error accessing {table_choice} table: {e}. It might not exist yet.")
-        finally:
-            conn.close()
 
     elif Options == "Perform Queries":
         st.header("Run Predefined Queries")
@@ -414,23 +795,22 @@ def main():
     elif Options == "Enter YouTube Channel ID":
         st.header("Harvest Data from YouTube Channel")
         current_channel_id = st.text_input("Enter YouTube Channel ID:")
+        max_comment_pages = st.sidebar.slider("Max comment pages per video", min_value=1, max_value=50, value=5,
+                                              help="Each page holds up to 100 of the newest comments.")
 
         if st.button("Fetch & Store Channel Data"):
             if current_channel_id:
                 with st.spinner(f"Fetching data for channel ID: {current_channel_id}..."):
                     channel_df = channel_info(current_channel_id)
                     if not channel_df.empty:
-                        conn = sqlite3.connect('db1.db')
                         try:
-                            channel_df.to_sql('channels', conn, if_exists='append', index=False)
-                            st.success(f"✅ Channel '{channel_df['Channel_Name'].iloc[0]}' data inserted/updated!")
-                            st.dataframe(channel_df.iloc[:,[0,1,4,5]].style.format({'channel_viewcount': "{:,}", 'channel_subcount': "{:,}"}))
-                        except sqlite3.IntegrityError:
-                            st.info(f"Channel '{channel_df['Channel_Name'].iloc[0]}' (ID: {current_channel_id}) already exists. No new insertion.")
+                            if insert_channel(channel_df):
+                                st.success(f"✅ Channel '{channel_df['Channel_Name'].iloc[0]}' data inserted/updated!")
+                                st.dataframe(channel_df.iloc[:,[0,1,4,5]].style.format({'channel_viewcount': "{:,}", 'channel_subcount': "{:,}"}))
+                            else:
+                                st.info(f"Channel '{channel_df['Channel_Name'].iloc[0]}' (ID: {current_channel_id}) already exists. No new insertion.")
                         except Exception as e:
                             st.error(f"Error saving channel data: {e}")
-                        finally:
-                            conn.close()
                     else:
                         st.warning("⚠️ No channel data fetched. Check ID or API quota.")
             else:
@@ -440,7 +820,7 @@ def main():
         if st.button("Fetch & Store Video Data"):
             if current_channel_id:
                 with st.spinner(f"Fetching video IDs for channel: {current_channel_id} (This might take a while for large channels)..."):
-                    video_ids = playlist_videos_id([current_channel_id])
+                    video_ids = playlist_videos_id((current_channel_id,))
                 
                 if video_ids:
                     st.info(f"Found {len(video_ids)} video IDs. Now fetching detailed video data...")
@@ -459,12 +839,12 @@ def main():
         if st.button("Fetch & Store Comment Data"):
             if current_channel_id:
                 with st.spinner(f"Fetching video IDs for comments from channel: {current_channel_id}..."):
-                    video_ids_for_comments = playlist_videos_id([current_channel_id])
+                    video_ids_for_comments = playlist_videos_id((current_channel_id,))
                 
                 if video_ids_for_comments:
                     st.info(f"Found {len(video_ids_for_comments)} video IDs. Now fetching comments...")
                     with st.spinner("Fetching comment data and inserting into DB (This can be very slow and quota-heavy!)..."):
-                        comments_df_to_insert = comments_inf(video_ids_for_comments, current_channel_id) # Pass channel_id
+                        comments_df_to_insert = comments_inf(video_ids_for_comments, current_channel_id, max_comment_pages) # Pass channel_id
                         if not comments_df_to_insert.empty:
                             insert_comments_into_sqlite(comments_df_to_insert)
                         else:
@@ -475,8 +855,8 @@ def main():
                 st.error("Please enter a Channel ID first.")
 
 # Function to execute predefined queries (kept for consistency with your code)
+@st.cache_data(ttl=300)
 def execute_query(question):
-    conn = sqlite3.connect('db1.db')
     query_mapping = {
         "What are the names of all the videos and their corresponding channels?":
             """SELECT videos.Video_title, channels.channel_name
@@ -484,11 +864,10 @@ def execute_query(question):
                JOIN channels ON channels.channel_id = videos.channel_id;""",
 
         "Which channels have the most number of videos, and how many videos do they have?":
-            """SELECT channels.channel_name, COUNT(videos.Video_Id) AS video_count
-               FROM videos
-               JOIN channels ON channels.channel_id = videos.channel_id
-               GROUP BY channels.channel_name
-               ORDER BY video_count DESC;""",
+            """SELECT channels.channel_name, channel_stats.video_count
+               FROM channel_stats
+               JOIN channels ON channels.channel_id = channel_stats.channel_id
+               ORDER BY channel_stats.video_count DESC;""",
 
         "What are the top 10 most viewed videos and their respective channels?":
             """SELECT videos.Video_title, channels.channel_name
@@ -516,22 +895,21 @@ def execute_query(question):
                GROUP BY videos.Video_title;""",
 
         "What is the total number of views for each channel, and what are their corresponding channel names?":
-            """SELECT channels.channel_name, SUM(videos.Video_viewcount) AS total_views
-               FROM videos
-               JOIN channels ON channels.channel_id = videos.channel_id
-               GROUP BY channels.channel_name;""",
+            """SELECT channels.channel_name, channel_stats.total_views
+               FROM channel_stats
+               JOIN channels ON channels.channel_id = channel_stats.channel_id;""",
 
         "What are the names of all the channels that have published videos in the year 2022?":
             """SELECT DISTINCT channels.channel_name
                FROM channels
                JOIN videos ON channels.channel_id = videos.channel_id
-               WHERE strftime('%Y', videos.Video_pubdate) = '2022';""",
+               WHERE videos.Video_pubdate >= '2022-01-01'
+                 AND videos.Video_pubdate < '2023-01-01';""",
 
         "What is the average duration of all videos in each channel, and what are their corresponding channel names?":
-            """SELECT channels.channel_name, AVG(videos.Video_duration) AS average_duration
-               FROM videos
-               JOIN channels ON videos.channel_id = channels.channel_id
-               GROUP BY channels.channel_name;""",
+            """SELECT channels.channel_name, channel_stats.avg_duration AS average_duration
+               FROM channel_stats
+               JOIN channels ON channel_stats.channel_id = channels.channel_id;""",
 
         "Which videos have the highest number of comments, and what are their corresponding channel names?":
             """SELECT videos.Video_title, channels.channel_name
@@ -543,31 +921,31 @@ def execute_query(question):
 
     query = query_mapping.get(question)
     if query:
-        df = pd.read_sql_query(query, conn)
+        with get_conn() as conn:
+            df = pd.read_sql_query(query, conn)
     else:
         df = pd.DataFrame()
         st.error("Invalid query selected.")
 
-    conn.close()
     return df
 
 def fetch_channel_data(newchannel_id):
-    conn = sqlite3.connect('db1.db')
     query = "SELECT * FROM channels WHERE channel_id = ?"
-    df = pd.read_sql_query(query, conn, params=(newchannel_id,))
+    with get_conn() as conn:
+        df = pd.read_sql_query(query, conn, params=(newchannel_id,))
 
     if not df.empty:
         st.info("Channel already exists in the database. Returning existing data.")
-        conn.close()
         return df # Return the DataFrame directly
 
     st.info(f"Channel {newchannel_id} not found in DB. Attempting to fetch from YouTube API...")
     try:
         request = youtube.channels().list(
             part="snippet,contentDetails,statistics",
-            id=newchannel_id
+            id=newchannel_id,
+            fields=CHANNEL_FIELDS_MASK
         )
-        response = safe_api_call(request.execute) # Use safe_api_call
+        response = safe_api_call(request.execute, http=thread_http()) # Use safe_api_call
 
         if response and 'items' in response and len(response["items"]) > 0:
             data = {
@@ -582,23 +960,20 @@ def fetch_channel_data(newchannel_id):
             
             # Insert the fetched data into the SQLite database
             try:
-                new_channel_data.to_sql('channels', conn, if_exists='append', index=False)
-                st.success(f"✅ Channel '{new_channel_data['channel_name'].iloc[0]}' inserted into database.")
-            except sqlite3.IntegrityError:
-                 st.info(f"Channel '{new_channel_data['channel_name'].iloc[0]}' (ID: {newchannel_id}) already exists. No new insertion.")
+                if insert_channel(new_channel_data):
+                    st.success(f"✅ Channel '{new_channel_data['channel_name'].iloc[0]}' inserted into database.")
+                else:
+                    st.info(f"Channel '{new_channel_data['channel_name'].iloc[0]}' (ID: {newchannel_id}) already exists. No new insertion.")
             except Exception as e:
                 st.error(f"Error inserting new channel data into DB: {e}")
 
-            conn.close()
             return new_channel_data
         else:
             st.warning(f"No items found in the API response for channel ID: {newchannel_id}. It might be invalid or not public.")
-            conn.close()
             return pd.DataFrame()
 
     except Exception as e:
         st.error(f"Error fetching channel data from API: {e}")
-        conn.close()
         return pd.DataFrame()
 
 if __name__ == "__main__":
@@ -3,11 +3,15 @@ import sqlite3
 
 def ensure_tables():
     conn = sqlite3.connect("db1.db")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")
     cursor = conn.cursor()
 
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS videos (
-            Video_Id TEXT,
+            Video_Id TEXT PRIMARY KEY,
             Video_title TEXT,
             Video_Description TEXT,
             channel_id TEXT,
@@ -17,9 +21,9 @@ def ensure_tables():
             Video_likecount INTEGER,
             Video_favoritecount INTEGER,
             Video_commentcount INTEGER,
-            Video_duration TEXT,
+            Video_duration INTEGER,
             Video_thumbnails TEXT,
-            Video_caption TEXT
+            Video_caption INTEGER
         )
     """)
 
@@ -45,6 +49,34 @@ def ensure_tables():
         )
     """)
 
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS etag_cache (
+            resource_id TEXT PRIMARY KEY,
+            etag TEXT,
+            payload BLOB,
+            fetched_at REAL
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS channel_stats (
+            channel_id TEXT PRIMARY KEY,
+            video_count INTEGER,
+            total_views INTEGER,
+            total_likes INTEGER,
+            avg_duration REAL
+        )
+    """)
+
+    cursor.executescript("""
+        CREATE INDEX IF NOT EXISTS idx_videos_channel ON videos(channel_id);
+        CREATE INDEX IF NOT EXISTS idx_videos_views ON videos(Video_viewcount DESC);
+        CREATE INDEX IF NOT EXISTS idx_videos_likes ON videos(Video_likecount DESC);
+        CREATE INDEX IF NOT EXISTS idx_videos_comments_cnt ON videos(Video_commentcount DESC);
+        CREATE INDEX IF NOT EXISTS idx_videos_pubdate ON videos(Video_pubdate);
+        CREATE INDEX IF NOT EXISTS idx_comments_videoid ON comments(video_id);
+    """)
+
     conn.commit()
     conn.close()
 